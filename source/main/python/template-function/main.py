@@ -111,8 +111,8 @@ class TemplateFunction(metaclass=TemplateFunctionMeta):
 	one choses) that it finds in the class' MRO. 
 
 	If a TemplateFunction uses a PARAM_DEFAULT parameter and the parameter can be
-	found nowhere in the class scope, then a warning will be raised upon calling
-	the class, stating that class functionality may not be what was expected because
+	found nowhere in the class scope, then a warning will be raised upon first
+	calling the class, stating that class functionality may not be what was expected because
 	no default value was assigned to the parameter.
 
 	If a PARAM_DEFAULT parameter's accompanying static variable is set to
@@ -367,4 +367,13 @@ class TemplateFunction(metaclass=TemplateFunctionMeta):
 
 	@classmethod
 	def signature(cls):
-		return inspect.signature(cls.__call__)
\ No newline at end of file
+		"""
+		Return the signature of the function, computed once per class.
+		"""
+		# Not ``__signature__``, inspect.signature would pick that up
+		# for the class itself.
+		signature = cls.__dict__.get('__call_signature__')
+		if signature is None:
+			signature = inspect.signature(cls.__call__)
+			type.__setattr__(cls, '__call_signature__', signature)
+		return signature
\ No newline at end of file
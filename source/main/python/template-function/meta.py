@@ -1,16 +1,20 @@
-from .utils import lzip, copy_func, find_in_bases
+from .utils import copy_func
 from .constants import *
 from .exception import *
 
 import functools
 import inspect
+import types
 
 __all__ = ["mediator_meta", "TemplateFunctionMeta"]
 
+@functools.lru_cache(maxsize=None)
 def mediator_meta(*metaclasses):
 	"""
 	Return a metaclass that acts as a mediator for multiple metaclasses.
 
+	Calling this again with the same metaclasses returns the same mediator.
+
 	EXAMPLE
 	=======
 	----
@@ -36,6 +40,112 @@ def mediator_meta(*metaclasses):
 		pass
 	return MediatorMeta
 
+def _linearize(bases):
+	r"""
+	Return the C3 linearization of ``bases``, i.e. the ``__mro__`` a class
+	with these bases will have, minus the class itself.
+	"""
+	seqs = [list(base.__mro__) for base in bases] + [list(bases)]
+	mro = []
+	while True:
+		seqs = [seq for seq in seqs if seq]
+		if not seqs:
+			return mro
+		for seq in seqs:
+			head = seq[0]
+			if not any(head in other[1:] for other in seqs):
+				break
+		else:
+			raise TypeError(
+				"Cannot create a consistent method resolution "
+				"order (MRO) for bases %s" % \
+				", ".join(base.__name__ for base in bases)
+				)
+		mro.append(head)
+		for seq in seqs:
+			if seq[0] is head:
+				del seq[0]
+
+def _lookup_in_mro(mro, key):
+	r"""
+	Find an attribute along an MRO, returning the first value that
+	isn't None.
+	"""
+	for klass in mro:
+		val = klass.__dict__.get(key)
+		if val is not None:
+			return val
+
+def _is_sentinel(val):
+	r"""
+	Return whether a default value is PARAM_DEFAULT or PARAM_VARIABLE.
+	"""
+	return val is PARAM_DEFAULT or val is PARAM_VARIABLE
+
+def _call_impl(cls, call):
+	r"""
+	Build the dispatch closure of an implemented TemplateFunction.
+	"""
+	def _invoke(*args, **kwargs):
+		return call(cls, *args, **kwargs)
+	return _invoke
+
+def _call_unimpl(cls):
+	r"""
+	Build the dispatch closure of an unimplemented TemplateFunction.
+	"""
+	def _invoke(*args, **kwargs):
+		raise NotImplementedError(
+			"'%s' template function is not implemented." %\
+			cls.__name__
+			)
+	return _invoke
+
+def _make_unbound(cls, call):
+	r"""
+	Build the function returned by ``TemplateFunctionMeta.__get__``.
+	"""
+	@functools.wraps(call)
+	def unbound(*args, **kwargs):
+		return call(cls, *args, **kwargs)
+	return unbound
+
+def _bind_dispatch(cls):
+	r"""
+	Build the call state derived from ``__function__`` and
+	``__unimplemented__``. It is built once per class so that
+	TemplateFunctionMeta.__call__ is a single boolean test plus a direct
+	call of ``_invoke``.
+	"""
+	call = cls.__dict__.get('__function__')
+	if call is None or cls.__unimplemented__:
+		invoke = _call_unimpl(cls)
+	else:
+		invoke = _call_impl(cls, call)
+	# Bypass TemplateFunctionMeta.__setattr__, these belong to
+	# the class and not to ``__function__``.
+	type.__setattr__(cls, '_invoke', invoke)
+	type.__setattr__(cls, '_unbound',
+		invoke if call is None else _make_unbound(cls, call)
+		)
+
+def _rebind(cls):
+	r"""
+	Refresh everything derived from ``__function__`` and
+	``__unimplemented__`` after either is set on an existing class.
+	"""
+	call = cls.__dict__.get('__function__')
+	type.__setattr__(cls, '_fn_dict', {} if call is None else call.__dict__)
+	type.__setattr__(cls, '_has_warnings',
+		bool(cls._warnings) and call is not None and \
+		not cls.__unimplemented__
+		)
+	# Cached introspection describes the previous function.
+	for key in ('__argspec__', '__call_signature__'):
+		if key in cls.__dict__:
+			type.__delattr__(cls, key)
+	_bind_dispatch(cls)
+
 class TemplateFunctionMeta(type):
 	r"""
 	The metaclass for a Template Function.
@@ -48,38 +158,46 @@ class TemplateFunctionMeta(type):
 		# TFuncWarnings).
 		kwargs['_warnings'] = []
 
+		# The MRO the class is about to get, inherited attributes are
+		# resolved against it just like normal attribute access.
+		mro = _linearize(bases)
+
 		# Find the __call__ function.
 		call = kwargs.get('__call__')
 		if call is None:
-			call = _find_in_bases(bases, '__call__')
+			call = _lookup_in_mro(mro, '__call__')
 
 		# __unimplemented__ lets us know if a TemplateFunction is a function 
 		# which can be called, or simply serves as an abstract base which cannot 
 		# be called but instead inherited from and called as child functions.
 		#
-		# If __unimplemented__ is True, an error will be raised in
-		# TemplateFunctionMeta.__call__.
+		# If __unimplemented__ is True, TemplateFunctionMeta.__call__
+		# dispatches to a stub that raises an error.
 		if call is None:
 			kwargs['__unimplemented__'] = True
-			return super().__new__(metacls, name, bases, kwargs)
+			kwargs['_has_warnings'] = False
+			kwargs['_fn_dict'] = {}
+			cls = super().__new__(metacls, name, bases, kwargs)
+			_bind_dispatch(cls)
+			return cls
 		else:
 			if isinstance(call, TemplateFunctionMeta):
 				call = call.__function__
-			# Copy call so any changes we make to it don't affect the original.
-			call = copy_func(call)
 			# Move __call__.__doc__ over to class.__doc__. This is just semantic;
 			# it just makes the help information more viable to users calling
 			# ``help`` on a TemplateFunction.
-			if call.__doc__:
-				kwargs['__doc__'] = call.__doc__
+			doc = call.__doc__
+			if doc:
+				kwargs['__doc__'] = doc
 			elif flags.get('docstring'):
 				kwargs['__doc__'] = flags['docstring'].__doc__
-			if not (kwargs.get('__unimplemented__') or \
-				    flags.get('unimplemented')):
-				# Unless the user explicitly stated that the
-				# function is to remain unimplemented, set it
-				# to be implemented.
-				kwargs['__unimplemented__'] = False
+			# Unless the user explicitly stated that the
+			# function is to remain unimplemented, set it
+			# to be implemented.
+			kwargs['__unimplemented__'] = bool(
+				kwargs.get('__unimplemented__') or \
+				flags.get('unimplemented')
+				)
 
 		unwrap_level = flags.get('unwrap_level')
 		# "Undecorate" a decorated TemplateFunction.
@@ -94,26 +212,44 @@ class TemplateFunctionMeta(type):
 						break
 					call = wrapped
 
+		# Find any optional decorators to apply to the function.
+		decorators = kwargs.get('__decorators__', flags.get('decorators'))
+		if decorators is None:
+			decorators = _lookup_in_mro(mro, '__decorators__')
+
+		# Copy call so any changes we make to it don't affect the original,
+		# and so every class has its own function attribute storage.
+		call = copy_func(call)
+
+		# Only PARAM_DEFAULT & PARAM_VARIABLE defaults require rewriting,
+		# for any other function the argument parsing below is skipped.
+		needs_rewrite = any(map(_is_sentinel, call.__defaults__ or ()))
+
 		# has_defaults is a flag that serves to indicate
 		# later whether or not a warning should be raised
 		has_defaults = False
 
 		# Handle the specific default parameters 
 		# (PARAM_DEFAULT & PARAM_VARIABLE)
-		if call.__defaults__:
+		if needs_rewrite:
 			# Here we actually change the values of the default parameters
-			# depending on what the class-wide variables are.
-			arg_names = inspect.getfullargspec(call).args
+			# depending on what the class-wide variables are. This slice of
+			# the code object is exactly ``inspect.getfullargspec(call).args``.
+			code = call.__code__
+			arg_names = code.co_varnames[:code.co_argcount]
 			defaults = call.__defaults__
 
 			new_defaults = []
 
-			# This funky iterator will iterate through the names of the parameters
-			# with default arguments along with their associated default value.
-			for attr, val in reversed(lzip(*map(reversed, (arg_names, defaults)))):
-				if val not in {PARAM_DEFAULT, PARAM_VARIABLE}:
+			# The defaults belong to the last len(defaults) parameters.
+			offset = len(arg_names) - len(defaults)
+			for i, val in enumerate(defaults):
+				# _is_sentinel only tests identity, so ordinary defaults
+				# are never hashed or compared.
+				if not _is_sentinel(val):
 					new_defaults.append(val)
 					continue
+				attr = arg_names[offset + i]
 
 				if attr in kwargs:
 					val = kwargs[attr]
@@ -121,17 +257,14 @@ class TemplateFunctionMeta(type):
 					has_defaults = True
 					# Check the inherited functions to see if they sport the
 					# attribute we're looking for.
-					for base in bases:
-						val = base.__dict__.get(attr)
-						if val is not None:
-							break
+					val = _lookup_in_mro(mro, attr)
 					if val is None:
 						val = PARAM_DEFAULT
 						if not kwargs['__unimplemented__']:
 							kwargs['_warnings'].append(
 								TFuncWarnings.call_with_default
 								)
-				if val == PARAM_VARIABLE:
+				if val is PARAM_VARIABLE:
 					if new_defaults:
 						raise ParameterError(
 							"Default arguments set to "
@@ -143,9 +276,6 @@ class TemplateFunctionMeta(type):
 			call.__defaults__ = tuple(new_defaults)
 
 		# Apply any optional decorators to the function.
-		decorators = kwargs.get('__decorators__', flags.get('decorators'))
-		if decorators is None:
-			decorators = _find_in_bases(bases, '__decorators__')
 		if decorators:
 			if has_defaults:
 				# This actually shouldn't cause any interference with 
@@ -163,8 +293,17 @@ class TemplateFunctionMeta(type):
 		kwargs['__decorators__'] = decorators if decorators else []
 
 		kwargs['__function__'] = call
-
-		return super().__new__(metacls, name, bases, kwargs)
+		# Kept separately so attribute access doesn't have to go through
+		# ``__function__`` each time; usually this dict is empty. It has
+		# to be in the namespace already, since ``type.__new__`` may set
+		# attributes (``__init_subclass__``, ``__set_name__``).
+		kwargs['_fn_dict'] = call.__dict__
+		kwargs['_has_warnings'] = bool(kwargs['_warnings']) and \
+			not kwargs['__unimplemented__']
+
+		cls = super().__new__(metacls, name, bases, kwargs)
+		_bind_dispatch(cls)
+		return cls
 
 	# Need to implement this, otherwise type.__init__ is called
 	# which will raise a TypeError if flags are supplied.
@@ -175,15 +314,15 @@ class TemplateFunctionMeta(type):
 		r"""
 		X.__call__(*args, **kwargs) <==> X(*args, **kwargs)
 		"""
-		if cls.__unimplemented__:
-			raise NotImplementedError(
-				"'%s' template function is not implemented." %\
-				cls.__name__
-				)
-		if cls._warnings:
+		if cls._has_warnings:
+			# Warnings only fire on the first call, after which
+			# the class falls back to the fast path. The flag is
+			# cleared only once they have all fired, so a warning
+			# turned into an error keeps being raised.
 			for warning in cls._warnings:
 				warning.warn()
-		return cls.__function__(cls, *args, **kwargs)
+			type.__setattr__(cls, '_has_warnings', False)
+		return cls._invoke(*args, **kwargs)
 
 	# This would have to be in TemplateFunctionMeta's metaclass 
 	# for it to work anyways.
@@ -212,37 +351,33 @@ class TemplateFunctionMeta(type):
 		try:
 			return cls.__dict__[key]
 		except KeyError:
-			try:
-				return cls.__function__.__dict__[key]
-			except KeyError:
-				raise AttributeError(
-					"%s has no attribute '%s'." % \
-					(cls.__name__, key)
-					)
+			fn_dict = cls._fn_dict
+			if fn_dict and key in fn_dict:
+				return fn_dict[key]
+			raise AttributeError(
+				"%s has no attribute '%s'." % \
+				(cls.__name__, key)
+				)
 
 	def __setattr__(cls, key, val):
 		r"""
 		X.__setattr__(key, val) <==> X.key = val
 		"""
-		if key in cls.__function__.__dict__:
-			cls.__function__.__dict__[key] = val
+		fn_dict = cls._fn_dict
+		if fn_dict and key in fn_dict:
+			fn_dict[key] = val
 		else:
 			super().__setattr__(key, val)
+			if key in ('__function__', '__unimplemented__'):
+				_rebind(cls)
 
 	def __get__(cls, instance, owner):
 		r"""
 		Implement __get__ so TemplateFunctions can be used as methods.
 		"""
-		wraps = functools.wraps(cls.__function__)
 		if instance is None:
-			@wraps
-			def wrapped(*args, **kwargs):
-				return cls.__function__(cls, *args, **kwargs)
-		else:
-			@wraps
-			def wrapped(*args, **kwargs):
-				return cls.__function__(cls, instance, *args, **kwargs)
-		return wrapped
+			return cls._unbound
+		return types.MethodType(cls._unbound, instance)
 
 	def __repr__(cls):
 		r"""
@@ -257,6 +392,7 @@ class TemplateFunctionMeta(type):
 		"""
 		if not hasattr(cls.__function__, '__wrapped__'):
 			return cls
+		from .main import TemplateFunction
 		class UnwrappedFunction(TemplateFunction):
 			__call__ = cls.__function__.__wrapped__
 		return UnwrappedFunction
@@ -275,6 +411,7 @@ class TemplateFunctionMeta(type):
 
 		(composition of f and g)(x) = f(g(x))
 		"""
+		from .main import TemplateFunction
 		class CompositeFunction(TemplateFunction):
 			def __call__(cls_, *args, **kwargs):
 				result = other(*args, **kwargs)
@@ -290,8 +427,9 @@ class TemplateFunctionMeta(type):
 		to be sent into the first function, as opposed to a lone argument
 		that gets passed in when using ``__mul__``.
 		"""
+		from .main import TemplateFunction
 		class CompositeFunction(TemplateFunction):
-			def __call__(cls, *args, **kwargs):
+			def __call__(cls_, *args, **kwargs):
 				nargs, nkwargs = other(*args, **kwargs)
 				return cls(*nargs, **nkwargs)
 		return CompositeFunction
@@ -301,7 +439,13 @@ class TemplateFunctionMeta(type):
 		r"""
 		Return the parameters of the function.
 		"""
-		return inspect.getfullargspec(cls.__function__)
+		# Computed on first access and kept on the class itself
+		# (not inherited, subclasses may rewrite the defaults).
+		argspec = cls.__dict__.get('__argspec__')
+		if argspec is None:
+			argspec = inspect.getfullargspec(cls.__function__)
+			type.__setattr__(cls, '__argspec__', argspec)
+		return argspec
 
 	@property
 	def decorators(cls):
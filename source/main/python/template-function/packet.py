@@ -1,5 +1,10 @@
 __all__ = ["PacketEvaluator"]
 
+# States of ``PacketEvaluator._result`` other than a memoized result:
+# not evaluated yet, or not memoizing at all.
+_UNSET = object()
+_DISCARD = object()
+
 class PacketEvaluator:
 	r"""
 	An object that can be used to lazily evaluate a function.
@@ -12,12 +17,13 @@ class PacketEvaluator:
 	A PacketEvaluator can also be set to memoize the result of calling
 	itself using the ``set_memoize`` method.
 	"""
+	__slots__ = ('_func', '_params', '_result', '__weakref__')
+
 	def __init__(self, func, params):
 		self._func = func
 		self._params = params
-		self._result = None
 
-		self._memoize = True
+		self._result = _UNSET
 
 	def __repr__(self):
 		r"""
@@ -29,11 +35,14 @@ class PacketEvaluator:
 		r"""
 		X.__call__() <==> X()
 		"""
-		if self._memoize:
-			if self._result is None:
-				self._result = self._func(*self._params[0], **self._params[1])
-			return self._result
-		return self._func(*self._params[0], **self._params[1])
+		result = self._result
+		if result is _UNSET or result is _DISCARD:
+			args, kwargs = self._params
+			value = self._func(*args, **kwargs)
+			if result is _UNSET:
+				self._result = value
+			return value
+		return result
 
 	def set_memoize(self, bool):
 		r"""
@@ -42,7 +51,10 @@ class PacketEvaluator:
 		True >> Memoize the result of calling the packet.
 		False >> Discard the result of calling the packet.
 		"""
-		self._memoize = bool
+		if not bool:
+			self._result = _DISCARD
+		elif self._result is _DISCARD:
+			self._result = _UNSET
 
 	@property
 	def function(self):
@@ -2,6 +2,10 @@ import types
 
 __all__ = ["lzip", "lfilter", "lfilternone", "copy_func", "find_in_bases"]
 
+# The l-prefixed helpers below build a concrete list; only use them where
+# the result is reused or indexed. Anything iterated over once should use
+# the plain zip/filter iterator instead.
+
 def lzip(*iterables):
 	r"""
 	Shorthand for list(zip(*iterables))